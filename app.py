@@ -1,15 +1,10 @@
 import streamlit as st
-import pandas as pd
 import os
+import hashlib
 import tempfile
-import base64
 from datetime import datetime
-import zipfile
-import io
 from pathlib import Path
-import time
 
-from document_generator import WebDocumentGenerator
 from config import WebConfig
 
 # Page configuration
@@ -67,33 +62,84 @@ def init_session_state():
         st.session_state.doc_generator = None
     if 'products' not in st.session_state:
         st.session_state.products = []
+    if 'products_lower' not in st.session_state:
+        st.session_state.products_lower = ()
+    if 'product_index' not in st.session_state:
+        st.session_state.product_index = {}
     if 'selected_products' not in st.session_state:
         st.session_state.selected_products = []
     if 'generation_history' not in st.session_state:
         st.session_state.generation_history = []
     if 'data_loaded' not in st.session_state:
         st.session_state.data_loaded = False
+    if 'excel_bytes' not in st.session_state:
+        st.session_state.excel_bytes = b''
+    if 'init_key' not in st.session_state:
+        st.session_state.init_key = None
 
+@st.cache_resource(show_spinner=False)
 def setup_data_directories():
-    """Create necessary directories"""
+    """Create necessary directories once per server process"""
     directories = ['data', 'generated', 'temp']
     for directory in directories:
-        Path(directory).mkdir(exist_ok=True)
+        Path(directory).mkdir(parents=True, exist_ok=True)
 
-def get_file_download_link(file_path, filename):
-    """Create a download link for a file"""
-    with open(file_path, "rb") as f:
-        data = f.read()
-    b64 = base64.b64encode(data).decode()
-    href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}">Download {filename}</a>'
-    return href
+@st.cache_data(show_spinner=False)
+def _load_products(excel_bytes, sheet, _generator):
+    """Get unique products, cached per uploaded workbook and sheet"""
+    return _generator.get_unique_products()
+
+@st.cache_data(show_spinner=False)
+def _preview(excel_bytes, sheet, product, _generator):
+    """Get preview batch data, cached per uploaded workbook, sheet and product"""
+    return _generator.preview_product_data(product)
+
+def sync_selected_products():
+    """Copy the product multiselect value into the selection before the rerun"""
+    st.session_state.selected_products = st.session_state.product_multiselect
+
+def trigrams(text):
+    """Get the set of 3-character substrings of a lowercased string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def build_trigram_index(products_lower):
+    """Map each trigram to the indices of the products containing it"""
+    index = {}
+    for i, product in enumerate(products_lower):
+        for trigram in trigrams(product):
+            index.setdefault(trigram, []).append(i)
+    return index
+
+def search_products(query, products, products_lower, index):
+    """Case-insensitive substring search over products using the trigram index"""
+    query = query.lower()
+    if len(query) < 3:
+        return [p for p, p_lower in zip(products, products_lower) if query in p_lower]
+    
+    # Intersect posting lists, smallest first, then confirm the full substring
+    postings = sorted((index.get(trigram, []) for trigram in trigrams(query)), key=len)
+    candidates = set(postings[0])
+    for posting in postings[1:]:
+        if not candidates:
+            break
+        candidates.intersection_update(posting)
+    return [products[i] for i in sorted(candidates) if query in products_lower[i]]
+
+# Formats that are already compressed and gain nothing from deflating again
+STORED_EXTENSIONS = {".docx", ".xlsx", ".zip", ".png", ".jpg"}
 
 def create_zip_download(files):
-    """Create a ZIP file for multiple downloads"""
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zip_file:
+    """Create a ZIP file for multiple downloads, spooled to disk rather than held in memory"""
+    import zipfile
+    
+    zip_buffer = tempfile.TemporaryFile(dir="temp", suffix=".zip")
+    with zipfile.ZipFile(zip_buffer, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zip_file:
         for file_path, filename in files:
-            zip_file.write(file_path, filename)
+            # ZipFile.write copies the file in chunks; store compressed formats, deflate the rest quickly
+            if Path(filename).suffix.lower() in STORED_EXTENSIONS:
+                zip_file.write(file_path, filename, compress_type=zipfile.ZIP_STORED)
+            else:
+                zip_file.write(file_path, filename, compress_type=zipfile.ZIP_DEFLATED, compresslevel=1)
     zip_buffer.seek(0)
     return zip_buffer
 
@@ -124,29 +170,41 @@ def main():
             if excel_file and template_file:
                 with st.spinner("Initializing application..."):
                     try:
-                        # Save uploaded files
-                        excel_path = f"data/{excel_file.name}"
-                        template_path = f"data/{template_file.name}"
+                        # Uploaded files are read from memory, not saved to disk
+                        excel_bytes = excel_file.getvalue()
+                        template_bytes = template_file.getvalue()
+                        excel_hash = hashlib.sha1(excel_bytes).hexdigest()
+                        init_key = f"{excel_hash}{hashlib.sha1(template_bytes).hexdigest()}{sheet_name}"
                         
-                        with open(excel_path, "wb") as f:
-                            f.write(excel_file.getvalue())
-                        with open(template_path, "wb") as f:
-                            f.write(template_file.getvalue())
-                        
-                        # Initialize document generator
-                        config = WebConfig(
-                            excel_file=excel_path,
-                            template_file=template_path,
-                            sheet_name=sheet_name
-                        )
-                        
-                        st.session_state.doc_generator = WebDocumentGenerator(config)
-                        st.session_state.data_loaded = True
-                        
-                        # Load products
-                        st.session_state.products = st.session_state.doc_generator.get_unique_products()
-                        
-                        st.success("✅ Application initialized successfully!")
+                        if st.session_state.data_loaded and st.session_state.init_key == init_key:
+                            # Same files and sheet - reuse the existing generator
+                            st.success("✅ Application already initialized with these files")
+                        else:
+                            # Initialize document generator
+                            from document_generator import WebDocumentGenerator
+                            
+                            # The generator caches the parsed sheet, keyed on the upload's content
+                            config = WebConfig(
+                                excel_file=excel_file.name,
+                                template_file=template_file.name,
+                                sheet_name=sheet_name,
+                                excel_bytes=excel_bytes,
+                                template_bytes=template_bytes
+                            )
+                            
+                            st.session_state.doc_generator = WebDocumentGenerator(config)
+                            st.session_state.excel_bytes = excel_bytes
+                            st.session_state.init_key = init_key
+                            st.session_state.data_loaded = True
+                            
+                            # Load products
+                            st.session_state.products = _load_products(
+                                st.session_state.excel_bytes, sheet_name, st.session_state.doc_generator
+                            )
+                            st.session_state.products_lower = tuple(p.lower() for p in st.session_state.products)
+                            st.session_state.product_index = build_trigram_index(st.session_state.products_lower)
+                            
+                            st.success("✅ Application initialized successfully!")
                         
                     except Exception as e:
                         st.error(f"❌ Error initializing application: {str(e)}")
@@ -180,6 +238,9 @@ def main():
         
         return
     
+    # Heavy imports are only needed once data is loaded
+    import pandas as pd
+    
     # Main application interface
     tab1, tab2, tab3, tab4 = st.tabs(["📋 Product Selection", "🚀 Document Generation", "📊 Batch Preview", "📈 History & Analytics"])
     
@@ -201,7 +262,12 @@ def main():
         # Apply filters
         filtered_products = st.session_state.products
         if search_query:
-            filtered_products = [p for p in filtered_products if search_query.lower() in p.lower()]
+            filtered_products = search_products(
+                search_query,
+                st.session_state.products,
+                st.session_state.products_lower,
+                st.session_state.product_index
+            )
         
         # Product selection
         st.subheader(f"Available Products ({len(filtered_products)})")
@@ -216,12 +282,17 @@ def main():
                 if st.button("Clear Selection", use_container_width=True):
                     st.session_state.selected_products = []
             
-            # Product selection checkboxes
-            selected = []
-            for product in filtered_products:
-                is_selected = product in st.session_state.selected_products
-                if st.checkbox(product, value=is_selected, key=f"prod_{product}"):
-                    selected.append(product)
+            # Product selection - a single widget instead of one checkbox per product.
+            # Its value is driven through session state rather than `default`, which would
+            # give the widget a new identity on every change and drop alternate clicks.
+            selected_set = set(st.session_state.selected_products)
+            st.session_state.product_multiselect = [p for p in filtered_products if p in selected_set]
+            selected = st.multiselect(
+                "Select products",
+                filtered_products,
+                key="product_multiselect",
+                on_change=sync_selected_products
+            )
             
             st.session_state.selected_products = selected
             
@@ -262,10 +333,14 @@ def main():
                                     'type': 'single'
                                 })
                                 
-                                # Download link
+                                # Download button
                                 if auto_download:
-                                    download_link = get_file_download_link(result['filepath'], result['filename'])
-                                    st.markdown(download_link, unsafe_allow_html=True)
+                                    st.download_button(
+                                        label=f"Download {result['filename']}",
+                                        data=Path(result['filepath']).read_bytes(),
+                                        file_name=result['filename'],
+                                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                                    )
                                 
                                 # Show batch info
                                 st.info(f"📊 Contains {result['batch_count']} batches")
@@ -286,33 +361,47 @@ def main():
                     
                     results = []
                     total_products = len(st.session_state.selected_products)
+                    progress_step = max(1, total_products // 100)
+                    
+                    # Generate in parallel; each worker loads the Excel data once
+                    from concurrent.futures import ProcessPoolExecutor, as_completed
+                    from document_generator import init_worker, generate_document_worker
+                    
+                    config_dict = st.session_state.doc_generator.config.to_dict(include_buffers=True)
+                    max_workers = min(os.cpu_count() or 1, total_products)
                     
-                    for i, product in enumerate(st.session_state.selected_products):
-                        status_text.text(f"Processing {product} ({i+1}/{total_products})")
-                        progress_bar.progress((i + 1) / total_products)
+                    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(config_dict,)) as executor:
+                        futures = {
+                            executor.submit(generate_document_worker, product): product
+                            for product in st.session_state.selected_products
+                        }
                         
-                        try:
-                            result = st.session_state.doc_generator.generate_single_document(product)
-                            results.append(result)
+                        for i, future in enumerate(as_completed(futures)):
+                            product = futures[future]
+                            if i % progress_step == 0 or i + 1 == total_products:
+                                status_text.text(f"Processed {product} ({i+1}/{total_products})")
+                                progress_bar.progress((i + 1) / total_products)
                             
-                            # Add to history
-                            if result['success']:
-                                st.session_state.generation_history.append({
-                                    'timestamp': datetime.now(),
+                            try:
+                                result = future.result()
+                                results.append(result)
+                                
+                                # Add to history
+                                if result['success']:
+                                    st.session_state.generation_history.append({
+                                        'timestamp': datetime.now(),
+                                        'product': product,
+                                        'batches': result['batch_count'],
+                                        'filename': result['filename'],
+                                        'type': 'bulk'
+                                    })
+                                
+                            except Exception as e:
+                                results.append({
+                                    'success': False,
                                     'product': product,
-                                    'batches': result['batch_count'],
-                                    'filename': result['filename'],
-                                    'type': 'bulk'
+                                    'error': str(e)
                                 })
-                            
-                            time.sleep(0.1)  # Small delay for UI update
-                            
-                        except Exception as e:
-                            results.append({
-                                'success': False,
-                                'product': product,
-                                'error': str(e)
-                            })
                     
                     # Show results
                     successful = [r for r in results if r['success']]
@@ -324,15 +413,14 @@ def main():
                         # Create ZIP download for all successful files
                         if len(successful) > 1 and auto_download:
                             files_to_zip = [(r['filepath'], r['filename']) for r in successful]
-                            zip_buffer = create_zip_download(files_to_zip)
-                            
-                            st.download_button(
-                                label="📦 Download All as ZIP",
-                                data=zip_buffer,
-                                file_name=f"batch_documents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                                mime="application/zip",
-                                use_container_width=True
-                            )
+                            with create_zip_download(files_to_zip) as zip_buffer:
+                                st.download_button(
+                                    label="📦 Download All as ZIP",
+                                    data=zip_buffer.read(),
+                                    file_name=f"batch_documents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                                    mime="application/zip",
+                                    use_container_width=True
+                                )
                     
                     if failed:
                         st.error(f"❌ Failed to generate {len(failed)} documents")
@@ -352,7 +440,10 @@ def main():
             if st.button("🔍 Preview Batch Data"):
                 with st.spinner("Loading batch data..."):
                     try:
-                        preview_data = st.session_state.doc_generator.preview_product_data(preview_product)
+                        doc_generator = st.session_state.doc_generator
+                        preview_data = _preview(
+                            st.session_state.excel_bytes, doc_generator.config.sheet_name, preview_product, doc_generator
+                        )
                         
                         if preview_data:
                             st.success(f"📊 Found {len(preview_data)} batches for {preview_product}")
@@ -361,19 +452,17 @@ def main():
                             df = pd.DataFrame(preview_data)
                             st.dataframe(df, use_container_width=True)
                             
-                            # Basic statistics
+                            # Basic statistics - missing values are empty strings, so count non-empty cells
+                            counts = (df[['mfg_date', 'total_batch_yield', 'sent_to_document_room']] != '').sum()
                             col1, col2, col3, col4 = st.columns(4)
                             with col1:
                                 st.metric("Total Batches", len(preview_data))
                             with col2:
-                                valid_dates = len([b for b in preview_data if b.get('mfg_date')])
-                                st.metric("With MFG Dates", valid_dates)
+                                st.metric("With MFG Dates", int(counts['mfg_date']))
                             with col3:
-                                valid_yield = len([b for b in preview_data if b.get('total_batch_yield')])
-                                st.metric("With Yield Data", valid_yield)
+                                st.metric("With Yield Data", int(counts['total_batch_yield']))
                             with col4:
-                                sent_to_doc = len([b for b in preview_data if b.get('sent_to_document_room')])
-                                st.metric("Sent to Doc Room", sent_to_doc)
+                                st.metric("Sent to Doc Room", int(counts['sent_to_document_room']))
                             
                         else:
                             st.warning("No batch data found for this product.")
@@ -389,12 +478,11 @@ def main():
         if st.session_state.generation_history:
             # Convert history to dataframe
             history_df = pd.DataFrame(st.session_state.generation_history)
-            history_df['timestamp'] = pd.to_datetime(history_df['timestamp'])
             
-            # Display history
+            # Display history - entries are appended in order, so the newest are at the end
             st.subheader("Recent Generations")
             st.dataframe(
-                history_df.sort_values('timestamp', ascending=False).head(10),
+                history_df.tail(10).iloc[::-1],
                 use_container_width=True
             )
             
@@ -415,7 +503,7 @@ def main():
             
             # Recent activity chart
             st.subheader("Generation Activity")
-            daily_counts = history_df.groupby(history_df['timestamp'].dt.date).size()
+            daily_counts = history_df.groupby(pd.to_datetime(history_df['timestamp']).dt.date).size()
             st.bar_chart(daily_counts)
             
         else:
@@ -1,16 +1,39 @@
 import os
 import json
+import functools
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@functools.lru_cache(maxsize=4)
+def _read_config_file(filepath: str, mtime: float) -> Dict[str, Any]:
+    """Parse a config file; mtime is part of the cache key so edits are picked up"""
+    with open(filepath, 'r') as f:
+        return json.load(f)
 
 class WebConfig:
     """Configuration management for web application"""
     
-    def __init__(self, excel_file: str = None, template_file: str = None, sheet_name: str = "5_Arc_List"):
+    def __init__(self, excel_file: str = None, template_file: str = None, sheet_name: str = "5_Arc_List",
+                 parquet_file: str = None, excel_bytes: bytes = None, template_bytes: bytes = None):
         self.excel_file = excel_file or "data/Batch_Local_2025_09_07.xlsx"
+        # In-memory file contents (e.g. uploads); preferred over the paths when set
+        self.excel_bytes = excel_bytes
+        self.template_bytes = template_bytes
+        # Optional Parquet sidecar holding the parsed sheet, reused on re-init
+        self.parquet_file = parquet_file
         self.template_file = template_file or "data/Batch Record Register_template.docx"
         self.sheet_name = sheet_name
         self.output_folder = "generated"
+        # Parquet copies of parsed sheets and, under documents/, generated .docx files
+        self.cache_folder = "data/cache"
+        # Engine passed to pd.read_excel; calamine needs pandas>=2.2 and python-calamine.
+        # "polars" reads through polars' xlsx2csv engine when polars is installed
+        self.excel_engine = "calamine"
         
         # Default column mappings
         self.column_mappings = {
@@ -24,33 +47,90 @@ class WebConfig:
             "remarks": ["remarks", "remark", "comments", "note", "notes"],
             "sent_to_doc": ["sent_to_document_room_by_date", "sent_to_document_room", "document_room_date", "sent_to_doc", "doc_room_date"]
         }
+        self.build_column_index()
+    
+    def build_column_index(self):
+        """Build hash lookups over column_mappings; call again after replacing it"""
+        # Resolve a cleaned header with alias_index.get(header.lower()) instead of scanning every alias list
+        self.alias_index = {
+            alias: canonical
+            for canonical, aliases in self.column_mappings.items()
+            for alias in aliases
+        }
+        self.column_sets = {canonical: frozenset(aliases) for canonical, aliases in self.column_mappings.items()}
+        self._resolved_cols = None
+    
+    def resolve_columns(self, df_columns: Iterable[str]) -> Dict[str, str]:
+        """Map each canonical field to its exact-match column, cached per set of columns"""
+        columns = tuple(df_columns)
+        if self._resolved_cols is not None and self._resolved_cols[0] == columns:
+            return self._resolved_cols[1]
+        
+        hits = {}
+        for col in columns:
+            canonical = self.alias_index.get(str(col).lower())
+            if canonical is not None:
+                hits.setdefault(canonical, {}).setdefault(str(col).lower(), col)
+        
+        # Earlier aliases in column_mappings take priority when several are present
+        resolved = {}
+        for canonical, found in hits.items():
+            for alias in self.column_mappings[canonical]:
+                if alias in found:
+                    resolved[canonical] = found[alias]
+                    break
+        
+        self._resolved_cols = (columns, resolved)
+        return resolved
     
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, include_buffers: bool = False) -> Dict[str, Any]:
         """Convert configuration to dictionary"""
-        return {
+        data = {
             'excel_file': self.excel_file,
+            'parquet_file': self.parquet_file,
             'template_file': self.template_file,
             'sheet_name': self.sheet_name,
             'output_folder': self.output_folder,
+            'cache_folder': self.cache_folder,
+            'excel_engine': self.excel_engine,
             'column_mappings': self.column_mappings
         }
+        # Raw file contents are not JSON serializable, so they are opt-in
+        if include_buffers:
+            data['excel_bytes'] = self.excel_bytes
+            data['template_bytes'] = self.template_bytes
+        return data
     
     def save(self, filepath: str = "web_config.json"):
         """Save configuration to file"""
-        with open(filepath, 'w') as f:
-            json.dump(self.to_dict(), f, indent=4)
+        if orjson is not None:
+            Path(filepath).write_bytes(orjson.dumps(self.to_dict(), option=orjson.OPT_INDENT_2))
+        else:
+            with open(filepath, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
     
     @classmethod
     def load(cls, filepath: str = "web_config.json"):
         """Load configuration from file"""
         if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-            config = cls()
-            config.excel_file = data.get('excel_file', config.excel_file)
-            config.template_file = data.get('template_file', config.template_file)
-            config.sheet_name = data.get('sheet_name', config.sheet_name)
-            config.output_folder = data.get('output_folder', config.output_folder)
-            config.column_mappings = data.get('column_mappings', config.column_mappings)
-            return config
-        return cls()
\ No newline at end of file
+            return cls.from_dict(_read_config_file(filepath, os.path.getmtime(filepath)))
+        return cls()
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Create configuration from dictionary"""
+        config = cls()
+        config.excel_file = data.get('excel_file', config.excel_file)
+        config.parquet_file = data.get('parquet_file', config.parquet_file)
+        config.template_file = data.get('template_file', config.template_file)
+        config.sheet_name = data.get('sheet_name', config.sheet_name)
+        config.output_folder = data.get('output_folder', config.output_folder)
+        config.cache_folder = data.get('cache_folder', config.cache_folder)
+        config.excel_engine = data.get('excel_engine', config.excel_engine)
+        # Copy the alias lists; data may be the cached result of _read_config_file
+        mappings = data.get('column_mappings', config.column_mappings)
+        config.column_mappings = {field: list(aliases) for field, aliases in mappings.items()}
+        config.excel_bytes = data.get('excel_bytes', config.excel_bytes)
+        config.template_bytes = data.get('template_bytes', config.template_bytes)
+        config.build_column_index()
+        return config
\ No newline at end of file
@@ -1,11 +1,167 @@
+import numpy as np
 import pandas as pd
 from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
 import os
+import io
 from datetime import datetime
 import re
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 import logging
+import hashlib
+import json
+import functools
+import calendar
+import copy
+import shutil
+import threading
+from collections import OrderedDict
+
+from config import WebConfig
+from xlsx_reader import read_xlsx_sheet
+
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Sheet parsing options shared by the streaming reader and pandas
+READ_OPTIONS = {'dtype': str, 'na_values': ['', 'NULL', 'null', 'NaN'], 'keep_default_na': False}
+
+# Numeric dates such as 2024-01-31, 31/01/2024 or 31.01.2024
+DATE_PATTERN = re.compile(r'^(\d{1,4})([-./])(\d{1,2})\2(\d{1,4})$')
+
+# Patterns used in per-column, per-batch and per-document loops
+COLUMN_STRIP_PATTERN = re.compile(r'[^\w\s]')
+UNDERSCORES_PATTERN = re.compile(r'_+')
+BATCH_NUMBER_PATTERN = re.compile(r'(\d+)')
+PERCENT_STRIP_PATTERN = re.compile(r'[%\s]')
+FILENAME_STRIP_PATTERN = re.compile(r'[^\w\s-]')
+
+# Batch fields in table column order
+TABLE_FIELDS = (
+    'batch_no', 'mfg_date', 'expiry_date', 'total_batch_yield', 'total_batch_accountability',
+    'location_rack_shelf', 'remarks', 'sent_to_document_room'
+)
+
+# Resolved once instead of per table cell
+TEXT_TAG = qn('w:t')
+XML_SPACE = qn('xml:space')
+
+# Processed batch lists kept per product for repeated searches
+SEARCH_CACHE_SIZE = 128
+
+# Bump when sheet cleaning or document output changes so cached sheets and documents are rebuilt
+CACHE_VERSION = 2
+
+# Generated documents kept in the cache folder; the least recently used are removed first
+MAX_CACHED_DOCUMENTS = 500
+
+@functools.lru_cache(maxsize=4096, typed=True)
+def format_date(date_value):
+    """Format a date value as DD.MM.YYYY; cached since batches repeat the same dates"""
+    if not date_value or str(date_value).strip() == '':
+        return ''
+    
+    date_str = str(date_value).strip().upper()
+    if any(na_val in date_str for na_val in ['#N/A', '#NA', 'N/A', 'NA']):
+        return date_str
+    
+    try:
+        if hasattr(date_value, 'strftime'):
+            return date_value.strftime('%d.%m.%Y')
+        
+        date_str = date_str.split(' ')[0]
+        
+        match = DATE_PATTERN.match(date_str)
+        if not match:
+            return date_str
+        
+        # Same precedence as Y-M-D, D-M-Y, D/M/Y, M/D/Y, D.M.Y, Y.M.D without trial parsing
+        first, separator, middle, last = match.groups()
+        if len(first) == 4 and len(last) <= 2 and separator != '/':
+            candidates = [(int(first), int(middle), int(last))]
+        elif len(last) == 4 and len(first) <= 2:
+            candidates = [(int(last), int(middle), int(first))]
+            if separator == '/':
+                candidates.append((int(last), int(first), int(middle)))
+        else:
+            return date_str
+        
+        for year, month, day in candidates:
+            if year >= 1 and 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]:
+                return datetime(year, month, day).strftime('%d.%m.%Y')
+        
+        return date_str
+    
+    except Exception as e:
+        logger.warning("Could not format date: %s", e)
+        return date_str
+
+@functools.lru_cache(maxsize=4096, typed=True)
+def format_percentage_value(value):
+    """Format a percentage value with two decimals; cached since batches repeat values"""
+    if not value or str(value).strip() == '':
+        return ''
+    
+    value_str = str(value).strip().upper()
+    if any(na_val in value_str for na_val in ['#N/A', '#NA', 'N/A', 'NA']):
+        return value_str
+    
+    try:
+        clean_value = PERCENT_STRIP_PATTERN.sub('', value_str)
+        if clean_value and clean_value != 'nan':
+            num_value = float(clean_value)
+            return f"{num_value:.2f}%"
+        return ''
+    except:
+        return value_str
+
+def cache_df(func):
+    """Cache a DataFrame-returning generator method as Parquet at get_cache_path()"""
+    @functools.wraps(func)
+    def wrapper(self):
+        cache_path = self.get_cache_path()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                df = pd.read_parquet(cache_path)
+            except Exception as e:
+                # A truncated or corrupt sidecar is discarded and the workbook parsed again
+                self.logger.warning("Could not read Parquet sidecar, re-reading the workbook: %s", e)
+                try:
+                    os.remove(cache_path)
+                except OSError:
+                    pass
+            else:
+                # Reuse the sheet parsed on a previous load, including any first-sheet fallback
+                sheet_name = df.attrs.get('sheet_name')
+                if sheet_name and sheet_name != self.config.sheet_name:
+                    self.logger.warning("Sheet '%s' not found. Using first sheet.", self.config.sheet_name)
+                    self.config.sheet_name = sheet_name
+                return df
+        
+        df = func(self)
+        if cache_path:
+            # Parquet keeps attrs, so the sheet actually read travels with the data
+            df.attrs['sheet_name'] = self.config.sheet_name
+            self.save_parquet_sidecar(df, cache_path)
+        return df
+    return wrapper
+
+def cache_version_key(config) -> str:
+    """Identify the code version and column mappings that cached sheets and documents depend on"""
+    return f"{CACHE_VERSION}|{json.dumps(config.column_mappings, sort_keys=True)}"
 
 class WebDocumentGenerator:
     """
@@ -16,13 +172,19 @@ class WebDocumentGenerator:
         self.config = config
         self.df = None
         self.column_cache = {}
+        self._product_lower = None
+        self._product_index = {}
+        self._search_cache = OrderedDict()
+        self._excel_key = None
         self.setup_logging()
         self.load_excel_data()
+        self._template_bytes = self.load_template()
+        self._source_key = None
     
     def setup_logging(self):
         """Setup logging for web application"""
         logging.basicConfig(
-            level=logging.INFO,
+            level=logging.WARNING,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
@@ -30,78 +192,241 @@ class WebDocumentGenerator:
     def load_excel_data(self) -> bool:
         """Load Excel data for web use"""
         try:
-            if not os.path.exists(self.config.excel_file):
-                self.logger.error(f"Excel file not found: {self.config.excel_file}")
+            if self.config.excel_bytes is None and not os.path.exists(self.config.excel_file):
+                self.logger.error("Excel file not found: %s", self.config.excel_file)
                 return False
             
-            # Load Excel file
-            excel_data = pd.ExcelFile(self.config.excel_file)
-            
-            # Validate sheet name
-            if self.config.sheet_name not in excel_data.sheet_names:
-                self.logger.warning(f"Sheet '{self.config.sheet_name}' not found. Using first sheet.")
-                self.config.sheet_name = excel_data.sheet_names[0]
-            
-            # Load data
-            self.df = pd.read_excel(
-                self.config.excel_file,
-                sheet_name=self.config.sheet_name,
-                engine='openpyxl',
-                dtype=str,
-                na_values=['', 'NULL', 'null', 'NaN'],
-                keep_default_na=False
-            )
-            
-            # Clean column names
-            self.df.columns = self.clean_column_names(self.df.columns)
+            self.df = self.read_sheet()
             
             # Cache column mappings
             self.cache_column_mappings()
+            self.build_product_index()
             
-            self.logger.info(f"Loaded {len(self.df)} records")
+            self.logger.info("Loaded %d records", len(self.df))
             return True
             
         except Exception as e:
-            self.logger.error(f"Error loading Excel: {e}")
+            self.logger.error("Error loading Excel: %s", e)
             return False
     
+    def load_template(self) -> Optional[bytes]:
+        """Read the Word template once; each document is opened from these bytes"""
+        if self.config.template_bytes is not None:
+            return self.config.template_bytes
+        if not os.path.exists(self.config.template_file):
+            return None
+        
+        with open(self.config.template_file, 'rb') as f:
+            return f.read()
+    
+    @cache_df
+    def read_sheet(self):
+        """Parse the configured sheet into a string DataFrame with cleaned column names"""
+        df = None
+        if self.config.excel_engine == 'polars' and POLARS_AVAILABLE:
+            df = self.read_sheet_polars()
+        # calamine is native code and still the fastest; otherwise stream the XML ourselves
+        elif self.config.excel_engine != 'calamine' or not CALAMINE_AVAILABLE:
+            df = self.read_sheet_streaming()
+        
+        if df is None:
+            # Open the workbook once for sheet discovery, the header and the data
+            with self.open_workbook() as excel_data:
+                # Validate sheet name
+                if self.config.sheet_name not in excel_data.sheet_names:
+                    self.logger.warning("Sheet '%s' not found. Using first sheet.", self.config.sheet_name)
+                    self.config.sheet_name = excel_data.sheet_names[0]
+                
+                # Read the header first so only the mapped columns are converted
+                header = excel_data.parse(sheet_name=self.config.sheet_name, nrows=0).columns
+                
+                # Load data
+                df = excel_data.parse(
+                    sheet_name=self.config.sheet_name,
+                    usecols=self.select_columns(header),
+                    **READ_OPTIONS
+                )
+        
+        # Clean column names
+        df.columns = self.clean_column_names(df.columns)
+        return df
+    
+    def read_sheet_streaming(self) -> Optional[pd.DataFrame]:
+        """Read an .xlsx sheet straight from its ZIP parts, or None if that is not possible"""
+        try:
+            sheet_name, df = read_xlsx_sheet(
+                self.get_excel_source(),
+                self.config.sheet_name,
+                select_columns=self.select_columns,
+                **READ_OPTIONS
+            )
+        except Exception as e:
+            # Not an .xlsx (e.g. legacy .xls) or an unusual layout; let pandas handle it
+            self.logger.info("Streaming reader unavailable, using pandas: %s", e)
+            return None
+        
+        if sheet_name != self.config.sheet_name:
+            self.logger.warning("Sheet '%s' not found. Using first sheet.", self.config.sheet_name)
+            self.config.sheet_name = sheet_name
+        return df
+    
+    def read_sheet_polars(self) -> Optional[pd.DataFrame]:
+        """Read the sheet with polars' xlsx2csv engine, or None if that is not possible"""
+        try:
+            df = pl.read_excel(
+                self.get_excel_source(),
+                sheet_name=self.config.sheet_name,
+                engine='xlsx2csv',
+                # No schema inference keeps every column as text, like dtype=str
+                read_options={'infer_schema_length': 0, 'null_values': READ_OPTIONS['na_values']}
+            )
+        except Exception as e:
+            # Includes a missing sheet, which the pandas path falls back from
+            self.logger.info("polars reader unavailable, using pandas: %s", e)
+            return None
+        
+        positions = self.select_columns(df.columns)
+        if positions is not None:
+            df = df.select([df.columns[i] for i in positions])
+        return df.to_pandas()
+    
+    def get_cache_path(self) -> Optional[str]:
+        """Get the Parquet cache path for the current sheet, or None if it cannot be keyed"""
+        if self.config.parquet_file:
+            return self.config.parquet_file
+        
+        # Key on the workbook so an edited or different upload is parsed again
+        identity = f"{self.get_excel_key()}|{self.config.sheet_name}|{cache_version_key(self.config)}"
+        key = hashlib.sha1(identity.encode()).hexdigest()
+        Path(self.config.cache_folder).mkdir(parents=True, exist_ok=True)
+        return os.path.join(self.config.cache_folder, f"{key}.parquet")
+    
+    def get_excel_key(self) -> str:
+        """Identify the workbook: a content hash for uploaded bytes, else path, mtime and size"""
+        if self._excel_key is None:
+            if self.config.excel_bytes is not None:
+                self._excel_key = hashlib.sha1(self.config.excel_bytes).hexdigest()
+            else:
+                stat = os.stat(self.config.excel_file)
+                self._excel_key = f"{self.config.excel_file}|{stat.st_mtime}|{stat.st_size}"
+        return self._excel_key
+    
+    def get_excel_source(self):
+        """Return an in-memory buffer for uploaded bytes, else the Excel file path"""
+        if self.config.excel_bytes is not None:
+            return io.BytesIO(self.config.excel_bytes)
+        return self.config.excel_file
+    
+    def open_workbook(self):
+        """Open the workbook, falling back to read-only openpyxl when calamine is unavailable"""
+        engine = self.config.excel_engine
+        if engine == 'polars':
+            # polars is not a pandas engine; use the default one when it could not read the sheet
+            engine = 'calamine'
+        if engine == 'calamine' and not CALAMINE_AVAILABLE:
+            self.logger.warning("python-calamine not installed. Using openpyxl in read-only mode.")
+            engine = 'openpyxl'
+        
+        # Read-only mode streams rows instead of building the full workbook DOM
+        engine_kwargs = {'read_only': True, 'data_only': True} if engine == 'openpyxl' else None
+        return pd.ExcelFile(self.get_excel_source(), engine=engine, engine_kwargs=engine_kwargs)
+    
+    def save_parquet_sidecar(self, df, parquet_file):
+        """Persist the parsed sheet so later loads can skip Excel parsing"""
+        try:
+            # Write under a temporary name so concurrent loads never read a partial file
+            temp_path = f"{parquet_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_parquet(temp_path, compression="zstd")
+            os.replace(temp_path, parquet_file)
+        except Exception as e:
+            self.logger.warning("Could not write Parquet sidecar: %s", e)
+    
     def clean_column_names(self, columns):
         """Clean column names for web use"""
         cleaned = []
         for col in columns:
-            col_clean = re.sub(r'[^\w\s]', '', str(col))
+            col_clean = COLUMN_STRIP_PATTERN.sub('', str(col))
             col_clean = col_clean.strip().lower().replace(' ', '_')
-            col_clean = re.sub(r'_+', '_', col_clean)
+            col_clean = UNDERSCORES_PATTERN.sub('_', col_clean)
             cleaned.append(col_clean)
         return cleaned
     
     def cache_column_mappings(self):
         """Cache column mappings for performance"""
-        for field, possible_names in self.config.column_mappings.items():
-            self.column_cache[field] = self.find_column_name(possible_names, field, silent=True)
+        if self.df is None or self.df.empty:
+            return
+        
+        self.column_cache.update(self.resolve_column_mappings(self.df.columns))
+    
+    def resolve_column_mappings(self, columns) -> Dict[str, Optional[str]]:
+        """Resolve every configured field to one of the given cleaned column names"""
+        # Snapshot the columns once for every field's lookup
+        columns = list(columns)
+        column_set = set(columns)
+        columns_lower = [(col, col.lower()) for col in columns]
+        
+        # Exact matches come from the config's alias index; only the rest need partial matching
+        resolved = self.config.resolve_columns(columns)
+        return {
+            field: resolved.get(field) or self.find_column_name(
+                possible_names, field, silent=True, columns=column_set, columns_lower=columns_lower
+            )
+            for field, possible_names in self.config.column_mappings.items()
+        }
+    
+    def select_columns(self, header) -> Optional[List[int]]:
+        """Positions of the raw header columns that some field maps to, or None to keep all"""
+        columns = self.clean_column_names(header)
+        wanted = set(self.resolve_column_mappings(columns).values())
+        positions = [i for i, col in enumerate(columns) if col in wanted]
+        return positions or None
+    
+    def build_product_index(self):
+        """Map each lowercased product name to its row positions"""
+        product_column = self.column_cache.get('product')
+        if not product_column:
+            return
+        
+        # Few distinct products repeat over many rows, so store them as a categorical
+        product = self.df[product_column].astype('category')
+        self.df[product_column] = product
+        
+        # Normalise each distinct name once and map the row codes onto the lowered names
+        key_codes, keys = pd.factorize(product.cat.categories.astype(str).str.strip().str.lower())
+        codes = product.cat.codes.to_numpy()
+        # Missing names have code -1; clip so the lookup also works with no categories
+        row_codes = np.where(codes >= 0, key_codes[codes.clip(min=0)] if len(key_codes) else -1, -1)
+        self._product_lower = pd.Series(pd.Categorical.from_codes(row_codes, categories=keys), index=product.index)
+        self._product_index = self._product_lower.groupby(self._product_lower, observed=True).indices
+        self._search_cache = OrderedDict()
     
-    def find_column_name(self, possible_names, description="", silent=False):
+    def find_column_name(self, possible_names, description="", silent=False, columns=None, columns_lower=None):
         """Find column name with web-optimized logging"""
-        if self.df is None or self.df.empty:
-            return None
+        if columns is None:
+            if self.df is None or self.df.empty:
+                return None
+            columns = self.df.columns
+        if columns_lower is None:
+            columns_lower = [(col, col.lower()) for col in columns]
+            columns = set(columns)
         
         for name in possible_names:
-            if name in self.df.columns:
+            if name in columns:
                 if not silent:
-                    self.logger.info(f"Found {description} column: '{name}'")
+                    self.logger.info("Found %s column: '%s'", description, name)
                 return name
         
         # Try partial matching
-        for col in self.df.columns:
-            col_lower = col.lower()
-            for name in possible_names:
-                if name.lower() in col_lower:
+        names_lower = [(name, name.lower()) for name in possible_names]
+        for col, col_lower in columns_lower:
+            for name, name_lower in names_lower:
+                if name_lower in col_lower:
                     if not silent:
-                        self.logger.info(f"Found partial match for {description}: '{col}' contains '{name}'")
+                        self.logger.info("Found partial match for %s: '%s' contains '%s'", description, col, name)
                     return col
         
         if not silent:
-            self.logger.warning(f"Could not find {description} column")
+            self.logger.warning("Could not find %s column", description)
         return None
     
     def get_unique_products(self) -> List[str]:
@@ -114,22 +439,13 @@ class WebDocumentGenerator:
             if not product_column:
                 return []
             
-            unique_products = self.df[product_column].dropna()
-            unique_products = unique_products[unique_products.astype(str).str.strip() != '']
-            
-            seen = set()
-            result = []
-            for product in unique_products:
-                product_str = str(product).strip()
-                if product_str and product_str not in seen:
-                    seen.add(product_str)
-                    result.append(product_str)
-            
-            result.sort()
-            return result
+            # Strip the distinct names only; stripping can merge some, so dedupe again
+            unique_products = pd.Series(self.df[product_column].dropna().unique()).astype(str).str.strip()
+            unique_products = unique_products[unique_products != '']
+            return sorted(unique_products.unique().tolist())
             
         except Exception as e:
-            self.logger.error(f"Error getting unique products: {e}")
+            self.logger.error("Error getting unique products: %s", e)
             return []
     
     def search_product_batches(self, product_name: str) -> Optional[List[Dict]]:
@@ -142,116 +458,78 @@ class WebDocumentGenerator:
             if not product_column:
                 return None
             
-            # Case-insensitive search
-            mask = self.df[product_column].astype(str).str.lower() == product_name.lower()
-            product_batches = self.df[mask]
+            # Case-insensitive lookup in the prebuilt index
+            key = product_name.strip().lower()
+            if key in self._search_cache:
+                self._search_cache.move_to_end(key)
+                return self._search_cache[key]
+            
+            positions = self._product_index.get(key)
+            if positions is None:
+                return None
+            product_batches = self.df.iloc[positions]
             
+            batches = None
             if not product_batches.empty:
                 batches = self.process_batch_data(product_batches)
-                sorted_batches = self.sort_batches(batches)
-                return sorted_batches
             
-            return None
+            self._search_cache[key] = batches
+            if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+            return batches
             
         except Exception as e:
-            self.logger.error(f"Error searching batches: {e}")
+            self.logger.error("Error searching batches: %s", e)
             return None
     
     def process_batch_data(self, product_batches):
         """Process batch data for web output"""
-        batches = []
-        
-        for _, batch in product_batches.iterrows():
-            batch_data = {
-                'batch_no': self.get_formatted_value(batch, 'batch_no'),
-                'mfg_date': self.format_date_properly(self.get_formatted_value(batch, 'mfg_date')),
-                'expiry_date': self.format_date_properly(self.get_formatted_value(batch, 'expiry_date')),
-                'total_batch_yield': self.format_percentage(self.get_formatted_value(batch, 'yield')),
-                'total_batch_accountability': self.format_percentage(self.get_formatted_value(batch, 'accountability')),
-                'location_rack_shelf': self.get_formatted_value(batch, 'location'),
-                'remarks': self.get_formatted_value(batch, 'remarks'),
-                'sent_to_document_room': self.format_date_properly(self.get_formatted_value(batch, 'sent_to_doc'))
-            }
-            batches.append(batch_data)
+        fields = [
+            ('batch_no', 'batch_no', None),
+            ('mfg_date', 'mfg_date', self.format_date_properly),
+            ('expiry_date', 'expiry_date', self.format_date_properly),
+            ('total_batch_yield', 'yield', self.format_percentage),
+            ('total_batch_accountability', 'accountability', self.format_percentage),
+            ('location_rack_shelf', 'location', None),
+            ('remarks', 'remarks', None),
+            ('sent_to_document_room', 'sent_to_doc', self.format_date_properly)
+        ]
         
-        return batches
-    
-    def get_formatted_value(self, batch, field):
-        """Get formatted value for web display"""
-        column_name = self.column_cache.get(field)
-        if not column_name or column_name not in batch:
-            return ''
+        batches = pd.DataFrame(index=product_batches.index)
+        for key, field, formatter in fields:
+            column_name = self.column_cache.get(field)
+            if not column_name or column_name not in product_batches.columns:
+                batches[key] = ''
+                continue
+            
+            values = product_batches[column_name].fillna('').astype(str).str.strip()
+            if formatter:
+                # Batches repeat the same dates and percentages, so format each distinct value once
+                unique_values = values.unique()
+                values = values.map(dict(zip(unique_values, map(formatter, unique_values))))
+            batches[key] = values
         
-        value = batch[column_name]
-        if pd.isna(value) or value == '':
-            return ''
+        # Order by the first number in the batch number, keeping sheet order for ties
+        sort_key = batches['batch_no'].str.extract(BATCH_NUMBER_PATTERN, expand=False).fillna('0').map(int)
+        batches = batches.iloc[sort_key.argsort(kind='stable')]
         
-        return str(value).strip()
-    
-    def sort_batches(self, batches):
-        """Sort batches for web output"""
-        try:
-            def get_batch_key(batch):
-                batch_no = batch.get('batch_no', '0')
-                numbers = re.findall(r'\d+', batch_no)
-                batch_num = int(numbers[0]) if numbers else 0
-                return batch_num
-            
-            return sorted(batches, key=get_batch_key)
-        except Exception as e:
-            self.logger.error(f"Error sorting batches: {e}")
-            return batches
+        return batches.to_dict('records')
     
     def format_date_properly(self, date_value):
         """Format dates for web display"""
-        if not date_value or str(date_value).strip() == '':
-            return ''
-        
-        date_str = str(date_value).strip().upper()
-        if any(na_val in date_str for na_val in ['#N/A', '#NA', 'N/A', 'NA']):
-            return date_str
-        
         try:
-            if hasattr(date_value, 'strftime'):
-                return date_value.strftime('%d.%m.%Y')
-            
-            date_str = date_str.split(' ')[0]
-            
-            date_formats = [
-                '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y',
-                '%d.%m.%Y', '%Y.%m.%d'
-            ]
-            
-            for fmt in date_formats:
-                try:
-                    parsed_date = datetime.strptime(date_str, fmt)
-                    return parsed_date.strftime('%d.%m.%Y')
-                except ValueError:
-                    continue
-            
-            return date_str
-            
-        except Exception as e:
-            self.logger.warning(f"Could not format date: {e}")
-            return date_str
+            return format_date(date_value)
+        except TypeError:
+            # Unhashable values bypass the cache
+            return format_date.__wrapped__(date_value)
     
     def format_percentage(self, value):
         """Format percentages for web display"""
-        if not value or str(value).strip() == '':
-            return ''
-        
-        value_str = str(value).strip().upper()
-        if any(na_val in value_str for na_val in ['#N/A', '#NA', 'N/A', 'NA']):
-            return value_str
-        
         try:
-            clean_value = re.sub(r'[%\s]', '', value_str)
-            if clean_value and clean_value != 'nan':
-                num_value = float(clean_value)
-                return f"{num_value:.2f}%"
-            return ''
-        except:
-            return value_str
+            return format_percentage_value(value)
+        except TypeError:
+            # Unhashable values bypass the cache
+            return format_percentage_value.__wrapped__(value)
     
     def generate_single_document(self, product_name: str) -> Dict[str, Any]:
         """Generate single document - adapted for web use"""
@@ -271,20 +549,37 @@ class WebDocumentGenerator:
             
             # Generate filename
             current_date = datetime.now().strftime("%Y-%m-%d")
-            safe_name = re.sub(r'[^\w\s-]', '', product_name).strip()
+            safe_name = FILENAME_STRIP_PATTERN.sub('', product_name).strip()
             filename = f"{safe_name}_{current_date}.docx"
             filepath = os.path.join(self.config.output_folder, filename)
             
             # Check if template exists
-            if not os.path.exists(self.config.template_file):
+            if self._template_bytes is None:
+                self._template_bytes = self.load_template()
+            if self._template_bytes is None:
                 return {
                     'success': False,
                     'error': f'Template file not found: {self.config.template_file}',
                     'batch_count': 0
                 }
             
+            # Reuse the document built earlier from the same sheet and template
+            cached_path = self.get_document_cache_path(product_name)
+            if os.path.exists(cached_path):
+                shutil.copyfile(cached_path, filepath)
+                # Mark as recently used for pruning
+                os.utime(cached_path)
+                return {
+                    'success': True,
+                    'filename': filename,
+                    'filepath': filepath,
+                    'batch_count': len(batches),
+                    'product': product_name,
+                    'cached': True
+                }
+            
             # Load template and generate document
-            doc = Document(self.config.template_file)
+            doc = Document(io.BytesIO(self._template_bytes))
             
             # Replace product name placeholder
             self.fill_product_name_in_header(doc, product_name)
@@ -294,6 +589,7 @@ class WebDocumentGenerator:
             
             if success:
                 doc.save(filepath)
+                self.save_document_cache(filepath, cached_path)
                 
                 return {
                     'success': True,
@@ -310,76 +606,93 @@ class WebDocumentGenerator:
                 }
                 
         except Exception as e:
-            self.logger.error(f"Error generating document: {e}")
+            self.logger.error("Error generating document: %s", e)
             return {
                 'success': False,
                 'error': str(e),
                 'batch_count': 0
             }
     
+    def get_source_key(self) -> str:
+        """Identify the loaded sheet, the template and the output format, so cached documents go stale with them"""
+        if self._source_key is None:
+            template_key = hashlib.sha1(self._template_bytes).hexdigest()
+            self._source_key = f"{self.get_excel_key()}|{self.config.sheet_name}|{template_key}|{cache_version_key(self.config)}"
+        return self._source_key
+    
+    def get_document_cache_path(self, product_name: str) -> str:
+        """Get the cached document path for a product"""
+        key = hashlib.sha1(f"{product_name}|{self.get_source_key()}".encode()).hexdigest()
+        cache_folder = os.path.join(self.config.cache_folder, 'documents')
+        Path(cache_folder).mkdir(parents=True, exist_ok=True)
+        return os.path.join(cache_folder, f"{key}.docx")
+    
+    def save_document_cache(self, filepath, cached_path):
+        """Keep a copy of a generated document for later requests"""
+        try:
+            # Copy under a temporary name so other workers never see a partial file
+            temp_path = f"{cached_path}.{os.getpid()}.tmp"
+            shutil.copyfile(filepath, temp_path)
+            os.replace(temp_path, cached_path)
+            self.prune_document_cache(os.path.dirname(cached_path))
+        except Exception as e:
+            self.logger.warning("Could not cache document: %s", e)
+    
+    def prune_document_cache(self, cache_folder):
+        """Remove the least recently used documents beyond MAX_CACHED_DOCUMENTS"""
+        entries = [entry for entry in os.scandir(cache_folder) if entry.name.endswith('.docx')]
+        if len(entries) <= MAX_CACHED_DOCUMENTS:
+            return
+        
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - MAX_CACHED_DOCUMENTS]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                # Already removed by another worker
+                pass
+    
     def fill_product_name_in_header(self, doc, product_name):
         """Fill product name in document header"""
         try:
             from docx.shared import Pt
+            from docx.text.paragraph import Paragraph
             
             PLACEHOLDER = "{{PRODUCT_NAME}}"
             
-            # Search in headers
+            # Headers first, then the body; linked headers share a definition already visited
+            parts = []
             for section in doc.sections:
-                headers = [
-                    section.first_page_header,
-                    section.even_page_header, 
-                    section.header
-                ]
-                
-                for header in headers:
-                    if header:
-                        # Check paragraphs
-                        for paragraph in header.paragraphs:
-                            if PLACEHOLDER in paragraph.text:
-                                paragraph.text = paragraph.text.replace(PLACEHOLDER, product_name)
-                                for run in paragraph.runs:
-                                    run.bold = True
-                                    run.font.size = Pt(14)
-                                return True
-                        
-                        # Check tables in headers
-                        for table in header.tables:
-                            for row in table.rows:
-                                for cell in row.cells:
-                                    for paragraph in cell.paragraphs:
-                                        if PLACEHOLDER in paragraph.text:
-                                            paragraph.text = paragraph.text.replace(PLACEHOLDER, product_name)
-                                            for run in paragraph.runs:
-                                                run.bold = True
-                                                run.font.size = Pt(14)
-                                            return True
-            
-            # Search in main document
-            for paragraph in doc.paragraphs:
-                if PLACEHOLDER in paragraph.text:
-                    paragraph.text = paragraph.text.replace(PLACEHOLDER, product_name)
+                for header in (section.first_page_header, section.even_page_header, section.header):
+                    if not header.is_linked_to_previous:
+                        parts.append(header._element)
+            parts.append(doc.element.body)
+            
+            # One flat pass over every paragraph, including those inside tables
+            for part in parts:
+                for p in part.iter(qn('w:p')):
+                    # Cheap check over all text first
+                    if PLACEHOLDER not in ''.join(t.text or '' for t in p.iter(TEXT_TAG)):
+                        continue
+                    
+                    # Paragraph.text only covers direct runs; text inside hyperlinks, content
+                    # controls or tracked insertions would be deleted rather than replaced
+                    paragraph = Paragraph(p, None)
+                    text = paragraph.text
+                    if PLACEHOLDER not in text:
+                        continue
+                    
+                    # The placeholder may be split across runs, so replace at paragraph level
+                    paragraph.text = text.replace(PLACEHOLDER, product_name)
                     for run in paragraph.runs:
                         run.bold = True
                         run.font.size = Pt(14)
                     return True
             
-            # Search in tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            if PLACEHOLDER in paragraph.text:
-                                paragraph.text = paragraph.text.replace(PLACEHOLDER, product_name)
-                                for run in paragraph.runs:
-                                    run.bold = True
-                                    run.font.size = Pt(14)
-                                return True
-            
             return False
             
         except Exception as e:
-            self.logger.error(f"Error filling product name: {e}")
+            self.logger.error("Error filling product name: %s", e)
             return False
     
     def fill_batch_table_with_formatting(self, doc, batches):
@@ -388,40 +701,86 @@ class WebDocumentGenerator:
             if not doc.tables:
                 return False
             
-            table = doc.tables[0]
+            tbl = doc.tables[0]._tbl
+            
+            # Use the first data row as the row template if it is one plain cell per grid
+            # column (not e.g. a merged "enter batches below" row); otherwise a fresh row
+            rows = tbl.tr_lst
+            if len(rows) > 1 and self.is_plain_row(tbl, rows[1]):
+                template_tr = rows[1]
+            else:
+                template_tr = doc.tables[0].add_row()._tr
             
             # Clear existing data rows
-            while len(table.rows) > 1:
-                table._tbl.remove(table.rows[1]._tr)
+            for tr in tbl.tr_lst[1:]:
+                tbl.remove(tr)
+            if template_tr.getparent() is tbl:
+                tbl.remove(template_tr)
             
-            # Add new rows with data
+            self.prepare_row_template(template_tr)
+            
+            # Clone the template per batch and fill the text nodes directly
+            new_rows = []
             for batch in batches:
-                row = table.add_row()
-                cells = row.cells
+                tr = copy.deepcopy(template_tr)
                 
-                column_data = [
-                    batch.get('batch_no', ''),
-                    batch.get('mfg_date', ''),
-                    batch.get('expiry_date', ''),
-                    batch.get('total_batch_yield', ''),
-                    batch.get('total_batch_accountability', ''),
-                    batch.get('location_rack_shelf', ''),
-                    batch.get('remarks', ''),
-                    batch.get('sent_to_document_room', '')
-                ]
+                for tc, field in zip(tr.tc_lst, TABLE_FIELDS):
+                    data = batch.get(field, '')
+                    text = str(data) if data is not None else ''
+                    t = next(tc.iter(TEXT_TAG))
+                    t.text = text
+                    if text != text.strip():
+                        t.set(XML_SPACE, 'preserve')
                 
-                for col_idx, data in enumerate(column_data):
-                    if col_idx < len(cells):
-                        cells[col_idx].text = str(data) if data is not None else ''
-                        for paragraph in cells[col_idx].paragraphs:
-                            paragraph.alignment = 1  # Center alignment
+                new_rows.append(tr)
             
+            tbl.extend(new_rows)
             return True
             
         except Exception as e:
-            self.logger.error(f"Error filling table: {e}")
+            self.logger.error("Error filling table: %s", e)
+            return False
+    
+    def is_plain_row(self, tbl, tr):
+        """Check that a row has exactly one unmerged cell per grid column"""
+        if len(tr.tc_lst) != len(tbl.tblGrid.gridCol_lst):
             return False
+        return not tr.xpath('./w:tc/w:tcPr/w:gridSpan[@w:val != "1"] | ./w:tc/w:tcPr/w:vMerge')
+    
+    def prepare_row_template(self, tr):
+        """Reduce each cell of a row to one centered paragraph holding one empty run"""
+        for tc in tr.tc_lst:
+            paragraphs = tc.p_lst
+            paragraph = paragraphs[0] if paragraphs else tc.add_p()
+            for extra in paragraphs[1:]:
+                tc.remove(extra)
+            
+            # Keep the paragraph and first run formatting, drop the existing content
+            first_r = paragraph.find(qn('w:r'))
+            rPr = first_r.find(qn('w:rPr')) if first_r is not None else None
+            for child in list(paragraph):
+                if child.tag != qn('w:pPr'):
+                    paragraph.remove(child)
+            paragraph.get_or_add_pPr().jc_val = WD_ALIGN_PARAGRAPH.CENTER
+            
+            r = paragraph.add_r()
+            if rPr is not None:
+                r.insert(0, rPr)
+            r.add_t('')
     
     def preview_product_data(self, product_name: str) -> Optional[List[Dict]]:
         """Preview product data for web display"""
-        return self.search_product_batches(product_name)
\ No newline at end of file
+        return self.search_product_batches(product_name)
+
+
+# Per-process generator used by bulk generation workers
+_worker_generator = None
+
+def init_worker(config_dict: Dict[str, Any]):
+    """Load the Excel data once per worker process"""
+    global _worker_generator
+    _worker_generator = WebDocumentGenerator(WebConfig.from_dict(config_dict))
+
+def generate_document_worker(product_name: str) -> Dict[str, Any]:
+    """Generate a single document inside a worker process"""
+    return _worker_generator.generate_single_document(product_name)
@@ -0,0 +1,106 @@
+import openpyxl
+import pytest
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from config import WebConfig
+from document_generator import WebDocumentGenerator
+
+BATCH = {
+    'batch_no': '7',
+    'mfg_date': '',
+    'expiry_date': '12.11.2024',
+    'total_batch_yield': '0.98%',
+    'total_batch_accountability': '100.00%',
+    'location_rack_shelf': 'R3',
+    'remarks': '',
+    'sent_to_document_room': '',
+}
+EXPECTED_ROW = ['7', '', '12.11.2024', '0.98%', '100.00%', 'R3', '', '']
+
+
+@pytest.fixture
+def generator(tmp_path):
+    # No workbook is needed to fill a document
+    return WebDocumentGenerator(WebConfig(excel_file=str(tmp_path / "missing.xlsx")))
+
+
+def batch_table_document(merge_first_row=False):
+    doc = Document()
+    table = doc.add_table(rows=2, cols=8)
+    for cell, title in zip(table.rows[0].cells, ['Batch', 'MFG', 'EXP', 'Yield', 'Acc', 'Loc', 'Rem', 'Sent']):
+        cell.text = title
+    if merge_first_row:
+        merged = table.rows[1].cells[0].merge(table.rows[1].cells[7])
+        merged.text = "Enter batches below"
+    return doc
+
+
+def row_texts(doc):
+    return [[cell.text for cell in row.cells] for row in doc.tables[0].rows[1:]]
+
+
+def test_batch_rows_fill_every_column(generator):
+    doc = batch_table_document()
+
+    assert generator.fill_batch_table_with_formatting(doc, [BATCH, BATCH])
+    assert row_texts(doc) == [EXPECTED_ROW, EXPECTED_ROW]
+
+
+def test_merged_template_row_is_not_reused(generator):
+    doc = batch_table_document(merge_first_row=True)
+
+    assert generator.fill_batch_table_with_formatting(doc, [BATCH])
+    rows = doc.tables[0]._tbl.tr_lst
+    assert len(rows) == 2
+    assert len(rows[1].tc_lst) == 8
+    assert row_texts(doc) == [EXPECTED_ROW]
+
+
+def wrap_runs(paragraph, tag):
+    """Move a paragraph's runs into a w:hyperlink or w:sdt content wrapper"""
+    if tag == 'hyperlink':
+        wrapper = parse_xml(f'<w:hyperlink {nsdecls("w")} w:anchor="x"/>')
+        container = wrapper
+    else:
+        wrapper = parse_xml(f'<w:sdt {nsdecls("w")}><w:sdtContent/></w:sdt>')
+        container = wrapper[0]
+    for r in paragraph._p.r_lst:
+        container.append(r)
+    paragraph._p.append(wrapper)
+
+
+@pytest.mark.parametrize("wrapper", ['hyperlink', 'sdt'])
+def test_placeholder_outside_direct_runs_is_left_alone(generator, wrapper):
+    doc = Document()
+    header = doc.sections[0].header
+    wrapped = header.paragraphs[0]
+    wrapped.add_run("Product: {{PRODUCT_NAME}}")
+    wrap_runs(wrapped, wrapper)
+    plain = header.add_paragraph("Name: {{PRODUCT_NAME}}")
+
+    assert generator.fill_product_name_in_header(doc, "Product A")
+    assert ''.join(t.text for t in wrapped._p.iter(qn('w:t'))) == "Product: {{PRODUCT_NAME}}"
+    assert plain.text == "Name: Product A"
+
+
+def test_corrupt_sidecar_is_replaced(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "5_Arc_List"
+    ws.append(["Product Name", "Batch No."])
+    ws.append(["Product A", "B1"])
+    excel_file = tmp_path / "batches.xlsx"
+    wb.save(excel_file)
+
+    config = WebConfig(excel_file=str(excel_file))
+    config.cache_folder = str(tmp_path / "cache")
+    sidecar = WebDocumentGenerator(config).get_cache_path()
+    data = open(sidecar, 'rb').read()
+    with open(sidecar, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    generator = WebDocumentGenerator(config)
+    assert generator.get_unique_products() == ["Product A"]
+    assert WebDocumentGenerator(config).get_unique_products() == ["Product A"]
@@ -0,0 +1,58 @@
+import random
+from datetime import date, datetime
+
+import pytest
+
+from document_generator import format_date
+
+
+def strptime_format_date(date_value):
+    """The original trial-strptime implementation format_date must agree with"""
+    if not date_value or str(date_value).strip() == '':
+        return ''
+
+    date_str = str(date_value).strip().upper()
+    if any(na_val in date_str for na_val in ['#N/A', '#NA', 'N/A', 'NA']):
+        return date_str
+
+    if hasattr(date_value, 'strftime'):
+        return date_value.strftime('%d.%m.%Y')
+
+    date_str = date_str.split(' ')[0]
+    for fmt in ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y', '%Y.%m.%d']:
+        try:
+            return datetime.strptime(date_str, fmt).strftime('%d.%m.%Y')
+        except ValueError:
+            continue
+    return date_str
+
+
+@pytest.mark.parametrize("value", [
+    '', '   ', None, 'N/A', '#n/a', 'NaN', 'garbage',
+    '2024-01-31', '2024-01-31 00:00:00', '31-01-2024', '31/01/2024', '01/31/2024',
+    '12/11/2024', '31.01.2024', '2024.01.31', '2024/01/31', '2024-1-5', '5-1-2024',
+    '2024-02-29', '2023-02-29', '29/02/2023', '00/01/2024', '2024-13-01', '0000-01-01',
+    '31.12.99', '1.1.1', '2024-01-31T10:00', ' 07/08/2024 ', '2024--01-31',
+    datetime(2024, 1, 31, 8, 0), date(2024, 2, 29),
+])
+def test_known_values_match_strptime(value):
+    assert format_date(value) == strptime_format_date(value)
+
+
+def random_date_string(rng):
+    parts = [
+        str(rng.randint(0, 10000)).zfill(rng.choice([1, 2, 4])),
+        str(rng.randint(0, 13)).zfill(rng.choice([1, 2])),
+        str(rng.randint(0, 32)).zfill(rng.choice([1, 2, 4])),
+    ]
+    rng.shuffle(parts)
+    separators = rng.choice(['-', '/', '.', '-/', ''])
+    text = parts[0] + separators[0:1] + parts[1] + separators[-1:] + parts[2]
+    return text + rng.choice(['', ' 00:00:00', ' 12:30'])
+
+
+def test_random_values_match_strptime():
+    rng = random.Random(20241015)
+    for _ in range(20000):
+        value = random_date_string(rng)
+        assert format_date(value) == strptime_format_date(value), value
@@ -0,0 +1,170 @@
+import zipfile
+from datetime import date, datetime, time, timedelta
+
+import openpyxl
+import pandas as pd
+import pytest
+from openpyxl.cell.rich_text import CellRichText, TextBlock
+from openpyxl.cell.text import InlineFont
+from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+from xlsx_reader import read_xlsx_sheet
+
+READ_OPTIONS = {'dtype': str, 'na_values': ['', 'NULL', 'null', 'NaN'], 'keep_default_na': False}
+
+
+def read_with_calamine(path, sheet_name):
+    return pd.read_excel(path, sheet_name=sheet_name, engine='calamine', **READ_OPTIONS)
+
+
+def assert_matches_calamine(path, sheet_name):
+    resolved, df = read_xlsx_sheet(path, sheet_name, **READ_OPTIONS)
+    assert resolved == sheet_name
+    pd.testing.assert_frame_equal(df, read_with_calamine(path, sheet_name))
+
+
+def save_workbook(path, header, rows, epoch=None, formats=None):
+    wb = openpyxl.Workbook()
+    if epoch is not None:
+        wb.epoch = epoch
+    ws = wb.active
+    ws.title = "5_Arc_List"
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    for ref, number_format in (formats or {}).items():
+        ws[ref].number_format = number_format
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def batch_workbook(tmp_path):
+    rows = [
+        ["Product A", "B001", datetime(2024, 1, 31), "31/12/2025", 0.985, "99%", "Rack 1", None, date(2024, 2, 1)],
+        ["Product A", 1002, datetime(2024, 2, 29, 13, 45), 45000, 98.5, 100, "Rack 2", "ok", "NULL"],
+        ["product b ", "B-7", None, "2025.06.30", "N/A", "", None, "text", True],
+        ["Product C", 3.0, datetime(1999, 12, 31), "#N/A", 12345678901, 1e-05, "Rack 3", "NaN", False],
+    ]
+    formats = {"E2": "0.00%", "E3": "0.0", "D3": "dd/mm/yyyy"}
+    header = ["Product Name", "Batch No.", "MFG Date", "Expiry Date", "Total Batch Yield",
+              "Accountability", "Location", "Remarks", "Sent to Doc Room"]
+    return save_workbook(tmp_path / "batches.xlsx", header, rows, formats=formats)
+
+
+def test_batch_sheet_matches_calamine(batch_workbook):
+    assert_matches_calamine(batch_workbook, "5_Arc_List")
+
+
+def test_sparse_rows_and_cells_match_calamine(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "5_Arc_List"
+    ws["A1"], ws["C1"], ws["F1"] = "Product", "Batch", "Remarks"
+    ws["A3"], ws["F3"] = "Product A", "gap before"
+    ws["C6"] = "B9"
+    ws["H8"] = "beyond header"
+    path = tmp_path / "sparse.xlsx"
+    wb.save(path)
+
+    assert_matches_calamine(path, "5_Arc_List")
+
+
+def test_dates_times_and_durations_match_calamine(tmp_path):
+    rows = [
+        [datetime(2024, 3, 1, 8, 30), time(6, 15), timedelta(days=1, hours=6), date(1900, 3, 1)],
+        [datetime(1900, 1, 1), time(0, 0, 1), timedelta(minutes=90), date(2099, 12, 31)],
+    ]
+    formats = {"C2": "[h]:mm:ss", "C3": "[h]:mm:ss"}
+    path = save_workbook(tmp_path / "dates.xlsx", ["Stamp", "Time", "Duration", "Day"], rows, formats=formats)
+
+    assert_matches_calamine(path, "5_Arc_List")
+
+
+def test_1904_epoch_matches_calamine(tmp_path):
+    rows = [[datetime(2024, 1, 31), "B1"], [datetime(1904, 1, 2), "B2"]]
+    path = save_workbook(tmp_path / "mac.xlsx", ["MFG Date", "Batch"], rows, epoch=CALENDAR_MAC_1904)
+
+    assert_matches_calamine(path, "5_Arc_List")
+
+
+def test_rich_text_matches_calamine(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "5_Arc_List"
+    ws.append(["Product", "Remarks"])
+    ws.append(["Product A", CellRichText(["plain ", TextBlock(InlineFont(b=True), "bold"), " tail"])])
+    ws.append(["Product B", "x005F_escaped"])
+    path = tmp_path / "rich.xlsx"
+    wb.save(path)
+
+    assert_matches_calamine(path, "5_Arc_List")
+
+
+def test_inline_strings_and_implicit_references_match_calamine(tmp_path):
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    parts = {
+        "[Content_Types].xml": (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            f'<workbook {ns} {rel_ns}><sheets>'
+            '<sheet name="5_Arc_List" sheetId="1" r:id="rId1"/>'
+            '</sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+            '</Relationships>'
+        ),
+        "xl/worksheets/sheet1.xml": (
+            f'<worksheet {ns}><sheetData>'
+            '<row><c t="inlineStr"><is><t>Product</t></is></c><c t="inlineStr"><is><t>Batch</t></is></c></row>'
+            '<row><c t="inlineStr"><is><r><t>Prod</t></r><r><t>uct A</t></r></is></c><c><v>42</v></c></row>'
+            '<row r="4"><c r="B4" t="str"><v>formula text</v></c></row>'
+            '</sheetData></worksheet>'
+        ),
+    }
+    path = tmp_path / "inline.xlsx"
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+
+    assert_matches_calamine(path, "5_Arc_List")
+
+
+def test_missing_sheet_falls_back_to_first(batch_workbook):
+    resolved, df = read_xlsx_sheet(batch_workbook, "No Such Sheet", **READ_OPTIONS)
+
+    assert resolved == "5_Arc_List"
+    pd.testing.assert_frame_equal(df, read_with_calamine(batch_workbook, "5_Arc_List"))
+
+
+def test_column_selection_keeps_requested_positions(batch_workbook):
+    _, df = read_xlsx_sheet(batch_workbook, "5_Arc_List", select_columns=lambda header: [0, 3], **READ_OPTIONS)
+
+    expected = pd.read_excel(batch_workbook, engine='calamine', usecols=[0, 3], **READ_OPTIONS)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_empty_sheet_gives_empty_frame(tmp_path):
+    path = tmp_path / "empty.xlsx"
+    openpyxl.Workbook().save(path)
+
+    _, df = read_xlsx_sheet(path, "Sheet", **READ_OPTIONS)
+    assert df.empty
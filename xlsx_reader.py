@@ -0,0 +1,208 @@
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Tuple, Any, Callable, Optional
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import from_excel, from_ISO8601, WINDOWS_EPOCH, MAC_EPOCH
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+ROW_TAG = MAIN_NS + "row"
+CELL_TAG = MAIN_NS + "c"
+VALUE_TAG = MAIN_NS + "v"
+TEXT_TAG = MAIN_NS + "t"
+RUN_TAG = MAIN_NS + "r"
+INLINE_TAG = MAIN_NS + "is"
+
+CELL_REF_PATTERN = re.compile(r'^\$?([A-Z]+)\$?(\d+)$')
+
+
+def column_index(letters: str) -> int:
+    """Convert column letters to a 1-based index"""
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def text_content(element) -> str:
+    """Plain text of a shared or inline string, ignoring phonetic runs"""
+    parts = []
+    for child in element:
+        if child.tag == TEXT_TAG:
+            parts.append(child.text or '')
+        elif child.tag == RUN_TAG:
+            parts.append(child.findtext(TEXT_TAG) or '')
+    return ''.join(parts)
+
+
+def read_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    """Stream the shared string table"""
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as source:
+        for _, element in ET.iterparse(source):
+            if element.tag == MAIN_NS + "si":
+                strings.append(text_content(element).replace('x005F_', ''))
+                element.clear()
+    return strings
+
+
+def read_date_styles(archive: zipfile.ZipFile) -> Tuple[set, set]:
+    """Get the cell style indices that hold dates and durations"""
+    if "xl/styles.xml" not in archive.namelist():
+        return set(), set()
+
+    root = ET.fromstring(archive.read("xl/styles.xml"))
+    custom = {
+        int(fmt.get("numFmtId")): fmt.get("formatCode")
+        for fmt in root.iter(MAIN_NS + "numFmt")
+    }
+
+    date_styles, timedelta_styles = set(), set()
+    cell_xfs = root.find(MAIN_NS + "cellXfs")
+    for idx, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+        fmt_id = int(xf.get("numFmtId", 0))
+        fmt = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+        if is_date_format(fmt):
+            date_styles.add(idx)
+        if is_timedelta_format(fmt):
+            timedelta_styles.add(idx)
+    return date_styles, timedelta_styles
+
+
+def read_sheet_paths(archive: zipfile.ZipFile) -> Tuple[Dict[str, str], Any]:
+    """Map sheet names to their XML part, in workbook order, and get the date epoch"""
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    if workbook.tag != MAIN_NS + "workbook":
+        raise ValueError("Unsupported workbook namespace")
+
+    workbook_pr = workbook.find(MAIN_NS + "workbookPr")
+    date1904 = workbook_pr is not None and workbook_pr.get("date1904") in ("1", "true")
+
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(PKG_REL_NS + "Relationship")}
+
+    sheets = {}
+    for sheet in workbook.iter(MAIN_NS + "sheet"):
+        target = targets[sheet.get(REL_NS + "id")]
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join("xl", target))
+        sheets[sheet.get("name")] = path
+    return sheets, MAC_EPOCH if date1904 else WINDOWS_EPOCH
+
+
+def read_sheet_rows(archive, path, shared_strings, date_styles, timedelta_styles, epoch) -> List[List[Any]]:
+    """Stream sheet rows, converting cells the way pandas' openpyxl reader does"""
+    data = []
+    last_row_with_data = -1
+    row_counter = 0
+
+    with archive.open(path) as source:
+        for _, element in ET.iterparse(source):
+            if element.tag != ROW_TAG:
+                continue
+
+            row_number = int(element.get("r", row_counter + 1))
+            # Missing rows are empty
+            while len(data) < row_number - 1:
+                data.append([])
+            row_counter = row_number
+
+            row = []
+            col_counter = 0
+            for cell in element.iter(CELL_TAG):
+                ref = cell.get("r")
+                match = CELL_REF_PATTERN.match(ref) if ref else None
+                col_counter = column_index(match.group(1)) if match else col_counter + 1
+
+                data_type = cell.get("t", "n")
+                value = None if data_type == "inlineStr" else (cell.findtext(VALUE_TAG) or None)
+
+                if value is not None:
+                    if data_type == "n":
+                        value = float(value) if "." in value or "E" in value or "e" in value else int(value)
+                        style_id = int(cell.get("s", 0))
+                        if style_id in date_styles:
+                            try:
+                                value = from_excel(value, epoch, timedelta=style_id in timedelta_styles)
+                                if style_id in timedelta_styles:
+                                    # Durations render like the calamine engine's
+                                    value = pd.Timedelta(value)
+                            except (OverflowError, ValueError):
+                                value = float("nan")
+                        elif value == int(value):
+                            value = int(value)
+                    elif data_type == "s":
+                        value = shared_strings[int(value)]
+                    elif data_type == "b":
+                        value = bool(int(value))
+                    elif data_type == "e":
+                        value = float("nan")
+                    elif data_type == "d":
+                        value = from_ISO8601(value)
+                elif data_type == "inlineStr":
+                    inline = cell.find(INLINE_TAG)
+                    value = text_content(inline) if inline is not None else None
+
+                # Missing cells are empty
+                while len(row) < col_counter - 1:
+                    row.append("")
+                row.append("" if value is None else value)
+
+            element.clear()
+
+            while row and row[-1] == "":
+                row.pop()
+            if row:
+                last_row_with_data = len(data)
+            data.append(row)
+
+    # Trim trailing empty rows and pad to the widest row
+    data = data[:last_row_with_data + 1]
+    if data:
+        max_width = max(len(row) for row in data)
+        data = [row + [""] * (max_width - len(row)) for row in data]
+    return data
+
+
+def read_xlsx_sheet(source, sheet_name: str, select_columns: Optional[Callable] = None,
+                    **parser_kwargs) -> Tuple[str, pd.DataFrame]:
+    """
+    Read one sheet of an .xlsx file by streaming its XML directly.
+
+    Only values are read; styles are used solely to recognise dates. Falls back
+    to the first sheet when sheet_name is missing and returns the sheet actually
+    read. select_columns, if given, receives the header row and returns the column
+    positions to keep (or None for all). parser_kwargs are passed on as for
+    pd.read_excel (dtype, na_values, ...).
+    """
+    with zipfile.ZipFile(source) as archive:
+        sheets, epoch = read_sheet_paths(archive)
+        if sheet_name not in sheets:
+            sheet_name = next(iter(sheets))
+
+        shared_strings = read_shared_strings(archive)
+        date_styles, timedelta_styles = read_date_styles(archive)
+        data = read_sheet_rows(archive, sheets[sheet_name], shared_strings, date_styles, timedelta_styles, epoch)
+
+    if not data:
+        return sheet_name, pd.DataFrame()
+
+    if select_columns is not None:
+        usecols = select_columns(data[0])
+        if usecols is not None:
+            parser_kwargs['usecols'] = usecols
+
+    parser = TextParser(data, header=0, skip_blank_lines=False, **parser_kwargs)
+    return sheet_name, parser.read()